@@ -8,12 +8,21 @@ Currently supports Anthropic Claude with streaming responses.
 import asyncio
 import logging
 import os
+import time
 from abc import ABC, abstractmethod
 from collections.abc import AsyncGenerator
 from typing import Optional
 
 log = logging.getLogger(__name__)
 
+# Message roles accepted by the Anthropic messages API
+_ANTHROPIC_ROLES = frozenset(("user", "assistant"))
+
+# How long (seconds) an availability probe result is reused. Failures expire
+# quickly so recovery is noticed soon; successes are trusted for longer.
+AVAILABLE_CACHE_TTL = 30.0
+UNAVAILABLE_CACHE_TTL = 5.0
+
 
 class AIService(ABC):
     """Abstract base class for AI services."""
@@ -39,6 +48,10 @@ class AnthropicService(AIService):
         self.api_key = api_key
         self.model = model
         self._client = None
+        # (monotonic timestamp, result) of the last availability probe
+        self._availability_cache: Optional[tuple[float, bool]] = None
+        # Probe currently in flight, shared by concurrent is_available() callers
+        self._availability_probe: Optional[asyncio.Task] = None
 
     async def _get_client(self):
         """Lazy initialization of Anthropic client."""
@@ -46,12 +59,12 @@ class AnthropicService(AIService):
             try:
                 import anthropic
                 self._client = anthropic.AsyncAnthropic(api_key=self.api_key)
-                log.info(f"Initialized Anthropic client with model: {self.model}")
+                log.info("Initialized Anthropic client with model: %s", self.model)
             except ImportError:
                 log.error("anthropic package not installed. Run: pip install anthropic")
                 raise
             except Exception as e:
-                log.error(f"Failed to initialize Anthropic client: {e}")
+                log.error("Failed to initialize Anthropic client: %s", e)
                 raise
         return self._client
 
@@ -61,6 +74,23 @@ class AnthropicService(AIService):
             log.warning("Anthropic API key not configured")
             return False
 
+        # Reuse a recent probe result instead of hitting the API on every call
+        now = time.monotonic()
+        cached = self._availability_cache
+        if cached is not None:
+            checked_at, available = cached
+            ttl = AVAILABLE_CACHE_TTL if available else UNAVAILABLE_CACHE_TTL
+            if now - checked_at < ttl:
+                return available
+
+        # Concurrent callers wait on the same probe rather than each sending one;
+        # shield it so a cancelled caller does not cancel it for the others
+        if self._availability_probe is None or self._availability_probe.done():
+            self._availability_probe = asyncio.create_task(self._probe_availability())
+        return await asyncio.shield(self._availability_probe)
+
+    async def _probe_availability(self) -> bool:
+        """Send a minimal request to the API and cache whether it succeeded."""
         try:
             client = await self._get_client()
             # Test with a minimal request
@@ -69,10 +99,13 @@ class AnthropicService(AIService):
                 max_tokens=1,
                 messages=[{"role": "user", "content": "test"}]
             )
-            return True
+            available = True
         except Exception as e:
-            log.error(f"Anthropic service not available: {e}")
-            return False
+            log.error("Anthropic service not available: %s", e)
+            available = False
+
+        self._availability_cache = (time.monotonic(), available)
+        return available
 
     async def chat_completion(
         self,
@@ -99,16 +132,16 @@ Be concise, helpful, and practical in your responses. When suggesting commands,
                 system_content += f"\n\nCurrent terminal context:\n```\n{terminal_context}\n```"
 
             # Convert messages to Anthropic format
-            anthropic_messages = []
-            for msg in messages:
-                if msg.get("role") in ["user", "assistant"]:
-                    anthropic_messages.append({
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
+            anthropic_messages = [
+                {"role": msg["role"], "content": msg["content"]}
+                for msg in messages
+                if msg.get("role") in _ANTHROPIC_ROLES
+            ]
 
             if stream:
-                log.info(f"Starting streaming chat completion with {len(anthropic_messages)} messages")
+                log.info(
+                    "Starting streaming chat completion with %d messages", len(anthropic_messages)
+                )
 
                 async with client.messages.stream(
                     model=self.model,
@@ -120,7 +153,10 @@ Be concise, helpful, and practical in your responses. When suggesting commands,
                         yield text
 
             else:
-                log.info(f"Starting non-streaming chat completion with {len(anthropic_messages)} messages")
+                log.info(
+                    "Starting non-streaming chat completion with %d messages",
+                    len(anthropic_messages),
+                )
 
                 response = await client.messages.create(
                     model=self.model,
@@ -132,13 +168,26 @@ Be concise, helpful, and practical in your responses. When suggesting commands,
                 yield response.content[0].text
 
         except Exception as e:
-            log.error(f"Error in Anthropic chat completion: {e}")
+            log.error("Error in Anthropic chat completion: %s", e)
             yield f"Sorry, I encountered an error: {e!s}"
 
 
+# Keyword -> canned response table for MockAIService, checked in order against
+# the lowercased user message. "{message}" is replaced with the original text.
+_MOCK_RESPONSES = (
+    ("error", "I see you're encountering an error. Let me help you troubleshoot this issue. Could you share more details about when this error occurs?"),
+    ("command", "For '{message}', I recommend checking the documentation first. Here are some common approaches you could try..."),
+    ("how to", "For '{message}', I recommend checking the documentation first. Here are some common approaches you could try..."),
+)
+
+
 class MockAIService(AIService):
     """Mock AI service for testing and development."""
 
+    def __init__(self, mock_stream_delay: float = 0.0):
+        # Per-word delay used to simulate typing when streaming; 0 disables it
+        self.mock_stream_delay = mock_stream_delay
+
     async def is_available(self) -> bool:
         return True
 
@@ -151,12 +200,14 @@ class MockAIService(AIService):
         """Generate mock responses for testing."""
 
         user_message = messages[-1].get("content", "") if messages else ""
+        message_lower = user_message.lower()
 
         # Generate contextual mock responses
-        if "error" in user_message.lower():
-            response = "I see you're encountering an error. Let me help you troubleshoot this issue. Could you share more details about when this error occurs?"
-        elif "command" in user_message.lower() or "how to" in user_message.lower():
-            response = f"For '{user_message}', I recommend checking the documentation first. Here are some common approaches you could try..."
+        response = next(
+            (r for keyword, r in _MOCK_RESPONSES if keyword in message_lower), None
+        )
+        if response is not None:
+            response = response.replace("{message}", user_message)
         elif terminal_context and "pwd" in terminal_context:
             response = "I can see you're currently in a directory. Based on your terminal context, you might want to explore the current files with 'ls -la'."
         else:
@@ -164,10 +215,11 @@ class MockAIService(AIService):
 
         if stream:
             # Simulate streaming by yielding word by word
-            words = response.split()
-            for word in words:
+            delay = self.mock_stream_delay
+            for word in response.split():
                 yield word + " "
-                await asyncio.sleep(0.05)  # Simulate realistic typing speed
+                if delay:
+                    await asyncio.sleep(delay)  # Simulate realistic typing speed
         else:
             yield response
 
@@ -191,7 +243,7 @@ def create_ai_service(
     if provider == "mock":
         return MockAIService()
 
-    log.warning(f"Unknown AI provider: {provider}, falling back to mock service")
+    log.warning("Unknown AI provider: %s, falling back to mock service", provider)
     return MockAIService()
 
 
@@ -3,12 +3,15 @@
 危険検出時にクライアントに入力ブロック指示を送信する
 """
 
+import asyncio
 import logging
 import time
 from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
 
+from .terminals.asyncio_terminal import AsyncioTerminal
+
 log = logging.getLogger("aetherterm.auto_blocker")
 
 
@@ -97,9 +100,9 @@ class AutoBlocker:
 
         try:
             # 特定のセッションに接続されているクライアントに送信
-            import asyncio
-
-            _ = asyncio.create_task(self.sio.emit("auto_block", block_data))
+            _ = asyncio.create_task(
+                self.sio.emit("auto_block", block_data, room=AsyncioTerminal.room_name(session_id))
+            )
 
             log.info(f"Session {session_id} blocked: {reason.value} - {message}")
             return True
@@ -142,9 +145,12 @@ class AutoBlocker:
         }
 
         try:
-            import asyncio
-
-            _ = asyncio.create_task(self.sio.emit("auto_unblock", unblock_data))
+            # ブロックされたセッションのクライアントにのみ通知
+            _ = asyncio.create_task(
+                self.sio.emit(
+                    "auto_unblock", unblock_data, room=AsyncioTerminal.room_name(session_id)
+                )
+            )
 
             log.info(f"Session {session_id} unblocked")
             return True
@@ -179,9 +185,13 @@ class AutoBlocker:
             }
 
             try:
-                import asyncio
-
-                _ = asyncio.create_task(self.sio.emit("force_unblock", force_unblock_data))
+                _ = asyncio.create_task(
+                    self.sio.emit(
+                        "force_unblock",
+                        force_unblock_data,
+                        room=AsyncioTerminal.room_name(session_id),
+                    )
+                )
 
                 log.info(f"Session {session_id} force unblocked by admin")
                 return True
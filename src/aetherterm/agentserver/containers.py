@@ -6,6 +6,7 @@ from dependency_injector import containers, providers
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
+from aetherterm.agentserver import socketio_json
 from aetherterm.agentserver.ai_services import create_ai_service, set_ai_service
 
 
@@ -35,6 +36,7 @@ class ApplicationContainer(containers.DeclarativeContainer):
         socketio.AsyncServer,
         async_mode="asgi",
         cors_allowed_origins="*",  # Default to allow all origins, can be configured
+        json=socketio_json,
     )
 
     # Static files path
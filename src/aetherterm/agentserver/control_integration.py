@@ -220,19 +220,18 @@ class ControlIntegration:
 
             terminal = AsyncioTerminal.sessions[session_id]
 
-            # Socket.IOクライアントにブロック通知を送信
-            if self.sio_instance and hasattr(terminal, "client_sids"):
-                for client_sid in terminal.client_sids:
-                    await self.sio_instance.emit(
-                        "input_block",
-                        {
-                            "message": f"!!!CRITICAL ALERT!!! {message}",
-                            "block_reason": message,
-                            "unblock_key": "Ctrl+D",
-                            "session_id": session_id,
-                        },
-                        room=client_sid,
-                    )
+            # Socket.IOクライアントにブロック通知を送信（セッションのルームへ1回で配信）
+            if self.sio_instance and terminal.client_sids:
+                await self.sio_instance.emit(
+                    "input_block",
+                    {
+                        "message": f"!!!CRITICAL ALERT!!! {message}",
+                        "block_reason": message,
+                        "unblock_key": "Ctrl+D",
+                        "session_id": session_id,
+                    },
+                    room=AsyncioTerminal.room_name(session_id),
+                )
 
             logger.info(f"Blocked session {session_id}: {message}")
             return True
@@ -250,14 +249,13 @@ class ControlIntegration:
 
             terminal = AsyncioTerminal.sessions[session_id]
 
-            # Socket.IOクライアントにブロック解除通知を送信
-            if self.sio_instance and hasattr(terminal, "client_sids"):
-                for client_sid in terminal.client_sids:
-                    await self.sio_instance.emit(
-                        "input_unblock",
-                        {"message": "ブロックが解除されました", "session_id": session_id},
-                        room=client_sid,
-                    )
+            # Socket.IOクライアントにブロック解除通知を送信（セッションのルームへ1回で配信）
+            if self.sio_instance and terminal.client_sids:
+                await self.sio_instance.emit(
+                    "input_unblock",
+                    {"message": "ブロックが解除されました", "session_id": session_id},
+                    room=AsyncioTerminal.room_name(session_id),
+                )
 
             logger.info(f"Unblocked session {session_id}")
             return True
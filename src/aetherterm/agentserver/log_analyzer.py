@@ -4,10 +4,12 @@
 """
 
 import logging
+import re
 import time
+from collections import deque
 from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Deque, Dict, List, Optional
 
 log = logging.getLogger("aetherterm.log_analyzer")
 
@@ -69,8 +71,26 @@ class LogAnalyzer:
             "time_window": 30,  # 30秒間の監視ウィンドウ
         }
 
-        # セッション別の検出履歴
-        self.session_history: Dict[str, List[DetectionResult]] = {}
+        # セッション別の検出履歴（検出時刻順）
+        self.session_history: Dict[str, Deque[DetectionResult]] = {}
+
+        # 全キーワードを1つの正規表現にまとめたプレフィルタ
+        self._keyword_pattern: Optional[re.Pattern] = None
+        # 最短キーワード長（これより短い出力は照合するまでもない）
+        self._min_keyword_length = 0
+        self._rebuild_keyword_pattern()
+
+    def _rebuild_keyword_pattern(self):
+        """キーワード一覧からプレフィルタ用の正規表現を再構築"""
+        keywords = {k.lower() for k in self.critical_keywords + self.warning_keywords if k}
+        if not keywords:
+            self._keyword_pattern = None
+            self._min_keyword_length = 0
+            return
+        self._min_keyword_length = min(len(k) for k in keywords)
+        # 長いキーワードを優先して照合する
+        alternation = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+        self._keyword_pattern = re.compile(alternation)
 
     def analyze_output(self, session_id: str, output: str) -> Optional[DetectionResult]:
         """
@@ -83,10 +103,16 @@ class LogAnalyzer:
         Returns:
             DetectionResult: 検出結果（危険でない場合はNone）
         """
-        if not output or not output.strip():
+        # カーソル移動のエコーなど、どのキーワードよりも短い出力は解析しない
+        if len(output) < self._min_keyword_length or not output.strip():
             return None
 
         output_lower = output.lower()
+
+        # 大半の出力はキーワードを含まないため、1回の正規表現走査で除外する
+        if self._keyword_pattern is None or not self._keyword_pattern.search(output_lower):
+            return None
+
         detected_keywords = []
         severity = SeverityLevel.LOW
 
@@ -137,7 +163,7 @@ class LogAnalyzer:
 
         # セッション履歴に追加
         if session_id not in self.session_history:
-            self.session_history[session_id] = []
+            self.session_history[session_id] = deque()
         self.session_history[session_id].append(result)
 
         # 古い履歴をクリーンアップ（30秒以上前）
@@ -155,11 +181,10 @@ class LogAnalyzer:
         current_time = time.time()
         time_window = self.auto_block_conditions["time_window"]
 
-        self.session_history[session_id] = [
-            result
-            for result in self.session_history[session_id]
-            if current_time - result.timestamp <= time_window
-        ]
+        # 履歴は時刻順なので、先頭から期限切れのものだけを取り除く
+        history = self.session_history[session_id]
+        while history and current_time - history[0].timestamp > time_window:
+            history.popleft()
 
     def get_session_risk_level(self, session_id: str) -> SeverityLevel:
         """セッションの現在のリスクレベルを取得"""
@@ -190,6 +215,7 @@ class LogAnalyzer:
         elif severity in [SeverityLevel.MEDIUM, SeverityLevel.HIGH]:
             if keyword not in self.warning_keywords:
                 self.warning_keywords.append(keyword)
+        self._rebuild_keyword_pattern()
 
         log.info(f"Added custom keyword: {keyword} with severity {severity.value}")
 
@@ -199,6 +225,7 @@ class LogAnalyzer:
             self.critical_keywords.remove(keyword)
         if keyword in self.warning_keywords:
             self.warning_keywords.remove(keyword)
+        self._rebuild_keyword_pattern()
 
         log.info(f"Removed custom keyword: {keyword}")
 
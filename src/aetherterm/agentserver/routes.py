@@ -14,9 +14,18 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
+import contextlib
+import functools
+import hashlib
 import logging
 import os
+import stat
+import tempfile
+import time
+from collections import OrderedDict
 from mimetypes import guess_type
+from typing import Dict, List, Optional, Tuple
 
 from dependency_injector.wiring import Provide, inject
 from fastapi import APIRouter, HTTPException, Request
@@ -31,6 +40,51 @@ router = APIRouter()
 
 log = logging.getLogger("aetherterm.routes")
 
+# Bundled themes, addressed as "built-in-<name>"
+BUILTIN_THEMES_DIR = os.path.join(os.path.dirname(__file__), "themes")
+BUILTIN_THEME_PREFIX = "built-in-"
+
+# Style file names looked up in a theme directory, in order of preference
+STYLE_FILE_NAMES = ("style.css", "style.scss", "style.sass")
+
+# Shared sass partials available to every theme via the include path
+SASS_INCLUDE_DIR = os.path.join(os.path.dirname(__file__), "sass")
+# Files that can affect a theme's compiled CSS
+SASS_SOURCE_EXTENSIONS = (".css", ".scss", ".sass")
+
+# Compiled theme CSS only changes when one of its source files does
+THEME_CACHE_HEADERS = {"Cache-Control": "public, max-age=3600"}
+
+# Theme assets are served with a fixed table first, falling back to mimetypes
+THEME_CONTENT_TYPES = {
+    ".css": "text/css",
+    ".js": "application/javascript",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".svg": "image/svg+xml",
+    ".woff": "application/font-woff",
+    ".woff2": "font/woff2",
+    ".ttf": "application/x-font-ttf",
+}
+THEME_STATIC_HEADERS = {"Cache-Control": "public, max-age=86400"}
+
+# Compiled theme CSS, keyed by (style path, theme dir, source digest); also kept on
+# disk as <digest>.css under the theme CSS cache directory, newest files only
+MAX_THEME_CACHE_SIZE = 50
+_theme_cache: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+# In-flight compilations, so concurrent misses for one theme compile it once
+_compile_locks: Dict[Tuple[str, str, str], asyncio.Lock] = {}
+# Requests holding or waiting on each compile lock; the lock is dropped when none are left
+_compile_waiters: Dict[Tuple[str, str, str], int] = {}
+# Source digest per theme dir: (checked at, top-level dir mtimes, digest)
+THEME_DIGEST_TTL = 2.0
+_theme_digests: Dict[str, Tuple[float, Tuple[int, int], str]] = {}
+
+# Last /themes/list.json body, keyed by the theme directories' mtimes
+_themes_list_cache: Optional[Tuple[Tuple[str, int, int], dict]] = None
+
 templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), "templates"))
 
 # Mount static files directory
@@ -75,7 +129,7 @@ async def index(
 
 
 @router.get("/theme/{theme}/style.css")
-async def theme_style(theme: str):
+async def theme_style(theme: str, request: Request):
     """Serve theme CSS files."""
     try:
         import sass
@@ -84,41 +138,209 @@ async def theme_style(theme: str):
         raise HTTPException(status_code=500, detail="Sass compiler not available")
 
     # Get theme directory
-    themes_dir = os.path.join(os.path.expanduser("~"), ".config", "aetherterm", "themes")
-    builtin_themes_dir = os.path.join(os.path.dirname(__file__), "themes")
-
-    base_dir = None
-    if theme.startswith("built-in-"):
-        theme_name = theme[9:]  # Remove 'built-in-' prefix
-        base_dir = os.path.join(builtin_themes_dir, theme_name)
-    else:
-        base_dir = os.path.join(themes_dir, theme)
+    base_dir = _resolve_theme_dir(theme, _get_themes_directory())
 
     if not os.path.exists(base_dir):
         raise HTTPException(status_code=404, detail="Theme not found")
 
-    # Look for style file
-    style = None
-    for ext in ["css", "scss", "sass"]:
-        probable_style = os.path.join(base_dir, f"style.{ext}")
-        if os.path.exists(probable_style):
-            style = probable_style
-            break
-
+    style = _find_style_file(base_dir)
     if not style:
         raise HTTPException(status_code=404, detail="Style file not found")
 
-    # Compile sass if needed
-    sass_path = os.path.join(os.path.dirname(__file__), "sass")
+    # The key covers every stylesheet the compiler can reach, so it doubles as the ETag
+    cache_key = _get_theme_cache_key(style, base_dir)
+    etag = f'W/"{cache_key[2]}"'
+    headers = {**THEME_CACHE_HEADERS, "ETag": etag}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    css = _get_cached_theme(cache_key)
+    if css is not None:
+        return Response(content=css, media_type="text/css", headers=headers)
 
+    # Only one request compiles a given theme; concurrent ones wait for its result
+    lock = _compile_locks.setdefault(cache_key, asyncio.Lock())
+    _compile_waiters[cache_key] = _compile_waiters.get(cache_key, 0) + 1
     try:
-        css = sass.compile(filename=style, include_paths=[base_dir, sass_path])
-        return Response(content=css, media_type="text/css")
+        async with lock:
+            css = _get_cached_theme(cache_key)
+            if css is None:
+                css = await asyncio.to_thread(_read_compiled_css, cache_key[2])
+                if css is None:
+                    css = await _compile_theme(sass, style, base_dir)
+                    await asyncio.to_thread(_write_compiled_css, cache_key[2], css)
+                _cache_theme(cache_key, css)
+    finally:
+        _compile_waiters[cache_key] -= 1
+        if not _compile_waiters[cache_key]:
+            del _compile_waiters[cache_key]
+            del _compile_locks[cache_key]
+
+    return Response(content=css, media_type="text/css", headers=headers)
+
+
+async def _compile_theme(sass, style: str, base_dir: str) -> str:
+    """Compile a theme stylesheet in the default executor, off the event loop."""
+    compile_style = functools.partial(
+        sass.compile, filename=style, include_paths=[base_dir, SASS_INCLUDE_DIR]
+    )
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, compile_style)
     except Exception as e:
         log.error(f"Unable to compile style: {e}")
         raise HTTPException(status_code=500, detail="Style compilation failed")
 
 
+def _read_compiled_css(digest: str) -> Optional[str]:
+    """Return CSS compiled by an earlier process for this source digest, if any."""
+    try:
+        with open(
+            os.path.join(_get_theme_css_cache_directory(), f"{digest}.css"), encoding="utf-8"
+        ) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_compiled_css(digest: str, css: str) -> None:
+    """Atomically store compiled CSS in the cache directory and prune old entries.
+
+    Failures are only logged; the caller still serves the CSS from memory.
+    """
+    cache_dir = _get_theme_css_cache_directory()
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(css)
+        os.replace(tmp_path, os.path.join(cache_dir, f"{digest}.css"))
+    except OSError as e:
+        log.debug("Not caching compiled theme in %s: %s", cache_dir, e)
+        if tmp_path is not None:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+        return
+
+    try:
+        with os.scandir(cache_dir) as entries:
+            cached = [
+                (entry.stat().st_mtime_ns, entry.path)
+                for entry in entries
+                if entry.name.endswith(".css") and entry.is_file()
+            ]
+    except OSError:
+        return
+    for _, stale in sorted(cached, reverse=True)[MAX_THEME_CACHE_SIZE:]:
+        with contextlib.suppress(OSError):
+            os.remove(stale)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def _get_themes_directory() -> str:
+    """Return the user's themes directory."""
+    return os.path.join(os.path.expanduser("~"), ".config", "aetherterm", "themes")
+
+
+def _get_theme_css_cache_directory() -> str:
+    """Return the directory compiled theme CSS is cached in."""
+    return os.path.join(os.path.expanduser("~"), ".cache", "aetherterm", "themes")
+
+
+@functools.lru_cache(maxsize=128)
+def _resolve_theme_dir(theme: str, themes_dir: str) -> str:
+    """Map a theme name to its directory; ``built-in-`` names use the bundled themes."""
+    if theme.startswith(BUILTIN_THEME_PREFIX):
+        return os.path.join(BUILTIN_THEMES_DIR, theme[len(BUILTIN_THEME_PREFIX) :])
+    return os.path.join(themes_dir, theme)
+
+
+def _find_style_file(base_dir: str) -> Optional[str]:
+    """Return the theme's style file, preferring css over scss over sass."""
+    try:
+        with os.scandir(base_dir) as entries:
+            names = {
+                entry.name
+                for entry in entries
+                if entry.name in STYLE_FILE_NAMES and entry.is_file()
+            }
+    except OSError:
+        return None
+
+    for name in STYLE_FILE_NAMES:
+        if name in names:
+            return os.path.join(base_dir, name)
+    return None
+
+
+def _get_theme_cache_key(style_path: str, base_dir: str) -> Tuple[str, str, str]:
+    """Key compiled CSS by source path, include dir and a digest of its sources.
+
+    The digest is remembered per theme directory for THEME_DIGEST_TTL seconds,
+    so cache hits and 304s skip the directory walk. Adding, removing or
+    renaming a file at the top of the theme or include dir changes their mtime
+    and forces a fresh digest straight away.
+    """
+    dir_mtimes = (_dir_mtime(base_dir), _dir_mtime(SASS_INCLUDE_DIR))
+    now = time.monotonic()
+    memo = _theme_digests.get(base_dir)
+    if memo is not None and memo[1] == dir_mtimes and now - memo[0] < THEME_DIGEST_TTL:
+        digest = memo[2]
+    else:
+        digest = _get_theme_sources_digest(base_dir)
+        _theme_digests[base_dir] = (now, dir_mtimes, digest)
+    return (style_path, base_dir, digest)
+
+
+def _get_theme_sources_digest(base_dir: str) -> str:
+    """Digest the path, size and mtime of every stylesheet the compiler can reach.
+
+    This covers the theme directory and the shared sass include path, so
+    editing an imported partial (or upgrading the bundled partials) produces a
+    new digest.
+    """
+    digest = hashlib.sha1(usedforsecurity=False)
+    for root_dir in (base_dir, SASS_INCLUDE_DIR):
+        for dirpath, dirnames, filenames in os.walk(root_dir):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if not name.endswith(SASS_SOURCE_EXTENSIONS):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                digest.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\0".encode())
+    return digest.hexdigest()[:16]
+
+
+def _get_cached_theme(cache_key: Tuple[str, str, str]) -> Optional[str]:
+    """Return compiled CSS from the in-process LRU, refreshing its recency."""
+    css = _theme_cache.get(cache_key)
+    if css is not None:
+        _theme_cache.move_to_end(cache_key)
+    return css
+
+
+def _cache_theme(cache_key: Tuple[str, str, str], css: str) -> None:
+    """Store compiled CSS in the in-process LRU, evicting the oldest entries."""
+    _theme_cache[cache_key] = css
+    _theme_cache.move_to_end(cache_key)
+    while len(_theme_cache) > MAX_THEME_CACHE_SIZE:
+        _theme_cache.popitem(last=False)
+
+
 @router.get("/theme/{theme}/{filename:path}")
 async def theme_static(theme: str, filename: str):
     """Serve static theme files."""
@@ -126,15 +348,7 @@ async def theme_static(theme: str, filename: str):
         raise HTTPException(status_code=403, detail="Access denied")
 
     # Get theme directory
-    themes_dir = os.path.join(os.path.expanduser("~"), ".config", "aetherterm", "themes")
-    builtin_themes_dir = os.path.join(os.path.dirname(__file__), "themes")
-
-    base_dir = None
-    if theme.startswith("built-in-"):
-        theme_name = theme[9:]  # Remove 'built-in-' prefix
-        base_dir = os.path.join(builtin_themes_dir, theme_name)
-    else:
-        base_dir = os.path.join(themes_dir, theme)
+    base_dir = _resolve_theme_dir(theme, _get_themes_directory())
 
     file_path = os.path.normpath(os.path.join(base_dir, filename))
 
@@ -142,24 +356,23 @@ async def theme_static(theme: str, filename: str):
     if not file_path.startswith(base_dir):
         raise HTTPException(status_code=403, detail="Access denied")
 
-    if not os.path.exists(file_path):
+    try:
+        stat_result = os.stat(file_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="File not found") from None
+    if not stat.S_ISREG(stat_result.st_mode):
         raise HTTPException(status_code=404, detail="File not found")
 
     # Determine content type
-    content_type = guess_type(file_path)[0]
-    if content_type is None:
-        # Fallback content types
-        ext = filename.split(".")[-1].lower()
-        content_type = {
-            "png": "image/png",
-            "jpg": "image/jpeg",
-            "jpeg": "image/jpeg",
-            "gif": "image/gif",
-            "woff": "application/font-woff",
-            "ttf": "application/x-font-ttf",
-        }.get(ext, "text/plain")
-
-    return FileResponse(file_path, media_type=content_type)
+    ext = os.path.splitext(filename)[1].lower()
+    content_type = THEME_CONTENT_TYPES.get(ext) or guess_type(file_path)[0] or "text/plain"
+
+    return FileResponse(
+        file_path,
+        media_type=content_type,
+        stat_result=stat_result,
+        headers=THEME_STATIC_HEADERS,
+    )
 
 
 @router.get("/sessions/list.json")
@@ -193,32 +406,48 @@ async def sessions_list(
 @router.get("/themes/list.json")
 async def themes_list():
     """Get the list of available themes."""
-    themes_dir = os.path.join(os.path.expanduser("~"), ".config", "aetherterm", "themes")
-    builtin_themes_dir = os.path.join(os.path.dirname(__file__), "themes")
-
-    themes = []
-    if os.path.exists(themes_dir):
-        themes = [
-            theme
-            for theme in os.listdir(themes_dir)
-            if os.path.isdir(os.path.join(themes_dir, theme)) and not theme.startswith(".")
-        ]
-
-    builtin_themes = []
-    if os.path.exists(builtin_themes_dir):
-        builtin_themes = [
-            f"built-in-{theme}"
-            for theme in os.listdir(builtin_themes_dir)
-            if os.path.isdir(os.path.join(builtin_themes_dir, theme)) and not theme.startswith(".")
-        ]
-
-    return JSONResponse(
-        {
-            "themes": sorted(themes),
-            "builtin_themes": sorted(builtin_themes),
-            "dir": themes_dir,
-        }
-    )
+    themes_dir = _get_themes_directory()
+    builtin_themes_dir = BUILTIN_THEMES_DIR
+
+    # Adding or removing a theme directory bumps its parent's mtime
+    global _themes_list_cache
+    cache_key = (themes_dir, _dir_mtime(themes_dir), _dir_mtime(builtin_themes_dir))
+    if _themes_list_cache is not None and _themes_list_cache[0] == cache_key:
+        return JSONResponse(_themes_list_cache[1])
+
+    themes = _list_theme_dirs(themes_dir)
+    builtin_themes = [
+        f"{BUILTIN_THEME_PREFIX}{theme}" for theme in _list_theme_dirs(builtin_themes_dir)
+    ]
+
+    body = {
+        "themes": sorted(themes),
+        "builtin_themes": sorted(builtin_themes),
+        "dir": themes_dir,
+    }
+    _themes_list_cache = (cache_key, body)
+    return JSONResponse(body)
+
+
+def _list_theme_dirs(path: str) -> List[str]:
+    """List the non-hidden subdirectories of a themes directory."""
+    try:
+        with os.scandir(path) as entries:
+            return [
+                entry.name
+                for entry in entries
+                if not entry.name.startswith(".") and entry.is_dir()
+            ]
+    except OSError:
+        return []
+
+
+def _dir_mtime(path: str) -> int:
+    """Return a directory's mtime in nanoseconds, or 0 if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
 
 
 @router.get("/local.js")
@@ -226,7 +455,7 @@ async def local_js():
     """Serve local JavaScript files."""
     local_js_dir = os.path.join(os.path.expanduser("~"), ".config", "aetherterm", "local.js")
 
-    js_content = ""
+    js_parts = []
     if os.path.exists(local_js_dir):
         for filename in os.listdir(local_js_dir):
             if not filename.endswith(".js"):
@@ -234,8 +463,9 @@ async def local_js():
             file_path = os.path.join(local_js_dir, filename)
             try:
                 with open(file_path, encoding="utf-8") as f:
-                    js_content += f.read() + ";\n"
+                    js_parts.append(f.read())
             except Exception as e:
                 log.warning(f"Could not read {file_path}: {e}")
 
+    js_content = "".join(part + ";\n" for part in js_parts)
     return Response(content=js_content, media_type="application/javascript")
@@ -29,7 +29,7 @@ import webbrowser
 
 import uvicorn
 
-from aetherterm.agentserver import socket_handlers
+from aetherterm.agentserver import socket_handlers, socketio_json
 from aetherterm.agentserver.containers import ApplicationContainer
 from aetherterm.agentserver.routes import router
 
@@ -489,7 +489,7 @@ def create_app(**kwargs):
     fastapi_app.include_router(router)
 
     # Create Socket.IO server
-    sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+    sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*", json=socketio_json)
 
     # Create combined ASGI application
     uri_root_path = config.get("uri_root_path", "")
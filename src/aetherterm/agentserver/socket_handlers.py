@@ -1,7 +1,10 @@
 import logging
+from dataclasses import dataclass, field
+from typing import List, Optional
 from uuid import uuid4
 import asyncio
 
+import jinja2
 from dependency_injector.wiring import Provide, inject
 
 from aetherterm.agentserver import utils
@@ -21,11 +24,47 @@ log = logging.getLogger("aetherterm.socket_handlers")
 # Global storage for socket.io server instance
 sio_instance = None
 
+# Analyzer/blocker singletons, resolved once in set_sio_instance so the
+# terminal output path does not go through their getters on every chunk
+log_analyzer_instance = None
+auto_blocker_instance = None
+
+# Streamed AI responses are coalesced into one emit per this many characters
+# or seconds, whichever comes first
+AI_CHUNK_FLUSH_SIZE = 1024
+AI_CHUNK_FLUSH_INTERVAL = 0.03
+# Terminal output is buffered per session and flushed after this delay
+# (seconds) or once this many characters are pending
+TERMINAL_OUTPUT_FLUSH_DELAY = 0.01
+TERMINAL_OUTPUT_FLUSH_SIZE = 64 * 1024
+_pending_output = {}  # {session_id: _PendingOutput}
+
+# Queue and task that send terminal broadcasts (started on first use)
+_broadcast_queue = None
+_broadcaster_task = None
+
+# Flushed output waiting for keyword analysis; output is skipped when full
+ANALYSIS_QUEUE_SIZE = 4096
+_analysis_queue = None
+_analyzer_task = None
+
+# Single-session updates from a wrapper program are coalesced per wrapper
+# connection for this long (seconds) before being sent to the frontend
+WRAPPER_UPDATE_FLUSH_DELAY = 0.01
+_pending_wrapper_updates = {}  # {sid: _PendingWrapperUpdates}
+
+# Characters of terminal scrollback passed to the AI as context
+AI_CONTEXT_HISTORY_SIZE = 1000
+# Maximum number of coalesced chunks waiting to be emitted per stream
+AI_SEND_QUEUE_SIZE = 64
+
 
 def set_sio_instance(sio):
     """Set the global socket.io server instance."""
-    global sio_instance
+    global sio_instance, log_analyzer_instance, auto_blocker_instance
     sio_instance = sio
+    log_analyzer_instance = get_log_analyzer()
+    auto_blocker_instance = get_auto_blocker()
     # 自動ブロッカーにSocket.IOインスタンスを設定
     set_socket_io_instance(sio)
 
@@ -43,31 +82,24 @@ def get_user_info_from_environ(environ):
 
 def check_session_ownership(session_id, current_user_info):
     """Check if the current user is the owner of the session."""
-    if session_id not in AsyncioTerminal.session_owners:
+    owner_info = AsyncioTerminal.session_owners.get(session_id)
+    if owner_info is None:
         return False
 
-    owner_info = AsyncioTerminal.session_owners[session_id]
-
     # Check X-REMOTE-USER header (most reliable for authenticated users)
-    if (
-        current_user_info.get("remote_user")
-        and owner_info.get("remote_user")
-        and current_user_info["remote_user"] == owner_info["remote_user"]
-    ):
+    remote_user = current_user_info.get("remote_user")
+    if remote_user and remote_user == owner_info.get("remote_user"):
         return True
 
     # Fallback to IP address comparison (less reliable but works for unsecure mode)
-    if (
-        current_user_info.get("remote_addr")
-        and owner_info.get("remote_addr")
-        and current_user_info["remote_addr"] == owner_info["remote_addr"]
-    ):
-        return True
-
-    return False
+    remote_addr = current_user_info.get("remote_addr")
+    return bool(remote_addr and remote_addr == owner_info.get("remote_addr"))
 
 
-import jinja2
+def _read_motd_file(path):
+    """Read the MOTD template from disk (blocking, run in a worker thread)."""
+    with open(path, "r") as f:
+        return f.read()
 
 
 @inject
@@ -77,12 +109,12 @@ async def connect(
     config_motd: str = Provide[ApplicationContainer.config.motd],
 ):
     """Handle client connection."""
-    log.info(f"Client connected: {sid}")
+    log.info("Client connected: %s", sid)
     await sio_instance.emit("connected", {"data": "Connected to Butterfly"}, room=sid)
 
     try:
-        with open(config_motd, "r") as f:
-            motd_content = f.read()
+        # Read off the event loop so a slow filesystem doesn't stall other clients
+        motd_content = await asyncio.to_thread(_read_motd_file, config_motd)
 
         # Jinja2 rendering
         template = jinja2.Template(motd_content)
@@ -92,24 +124,44 @@ async def connect(
             "terminal_output", {"session": "motd", "data": rendered_motd}, room=sid
         )
     except FileNotFoundError:
-        log.warning(f"MOTD file not found: {config_motd}")
+        log.warning("MOTD file not found: %s", config_motd)
     except Exception as e:
-        log.error(f"Error reading MOTD file: {e}")
+        log.error("Error reading MOTD file: %s", e)
 
 
 async def disconnect(sid, environ=None):
     """Handle client disconnection."""
-    log.info(f"Client disconnected: {sid}")
+    log.info("Client disconnected: %s", sid)
+
+    # Remove client from its terminal sessions and close those with no clients left
+    sessions = AsyncioTerminal.sessions
+    for session_id in AsyncioTerminal.sid_to_sessions.pop(sid, ()):
+        terminal = sessions.get(session_id)
+        if terminal is None:
+            continue
+        terminal.detach_client(sid)
+        log.info("Removed client %s from terminal session %s", sid, session_id)
+        # If no clients remain, close the terminal
+        if not terminal.client_sids:
+            log.info("No clients remaining for session %s, closing terminal", session_id)
+            await terminal.close()
+
+
+def _get_peer_address(sid):
+    """Return the (host, port) of a client's transport socket, if it exposes one."""
+    get_session = getattr(getattr(sio_instance, "manager", None), "get_session", None)
+    if get_session is None:
+        return None
 
-    # Remove client from any terminal sessions and close if no clients remain
-    for session_id, terminal in list(AsyncioTerminal.sessions.items()):
-        if hasattr(terminal, "client_sids") and sid in terminal.client_sids:
-            terminal.client_sids.discard(sid)
-            log.info(f"Removed client {sid} from terminal session {session_id}")
-            # If no clients remain, close the terminal
-            if not terminal.client_sids:
-                log.info(f"No clients remaining for session {session_id}, closing terminal")
-                await terminal.close()
+    try:
+        session = get_session(sid)
+        transport = session.get("transport") if session else None
+        transport_socket = getattr(transport, "socket", None)
+        if transport_socket is not None and hasattr(transport_socket, "getpeername"):
+            return transport_socket.getpeername()
+    except (AttributeError, KeyError, TypeError, OSError):
+        pass
+    return None
 
 
 @inject
@@ -129,31 +181,24 @@ async def create_terminal(
         # Check if this is a request for a specific session (not a new random one)
         is_specific_session_request = "session" in data and data["session"] != ""
 
-        log.info(f"Creating terminal session {session_id} for client {sid}")
-        log.debug(f"Terminal data: user={user_name}, path={path}")
+        log.info("Creating terminal session %s for client %s", session_id, sid)
+        log.debug("Terminal data: user=%s, path=%s", user_name, path)
 
         # Check if session already exists and is still active
-        if session_id in AsyncioTerminal.sessions:
-            existing_terminal = AsyncioTerminal.sessions[session_id]
+        existing_terminal = AsyncioTerminal.sessions.get(session_id)
+        if existing_terminal is not None:
             if not existing_terminal.closed:
-                log.info(f"Reusing existing terminal session {session_id}")
+                log.info("Reusing existing terminal session %s", session_id)
                 # Add this client to the existing terminal's client set
-                existing_terminal.client_sids.add(sid)
-                # Send terminal history to new client
-                if existing_terminal.history:
-                    await sio_instance.emit(
-                        "terminal_output",
-                        {"session": session_id, "data": existing_terminal.history},
-                        room=sid,
-                    )
-                # Notify client that terminal is ready
-                await sio_instance.emit(
-                    "terminal_ready", {"session": session_id, "status": "ready"}, room=sid
+                existing_terminal.attach_client(sid)
+                # Join the room and replay history in order with queued output
+                _queue_send(
+                    _join_session_room, sid, session_id, _sent_history(existing_terminal)
                 )
                 return
             else:
                 # Session exists but is closed - check ownership and notify client
-                log.info(f"Attempted to connect to closed session {session_id}")
+                log.info("Attempted to connect to closed session %s", session_id)
                 # Get environ for user info checking
                 environ = getattr(sio_instance, "environ", {}) if sio_instance else {}
                 current_user_info = get_user_info_from_environ(environ)
@@ -172,7 +217,7 @@ async def create_terminal(
 
         # Check if this is a request for a specific session that was previously closed
         if is_specific_session_request and session_id in AsyncioTerminal.closed_sessions:
-            log.info(f"Attempted to connect to previously closed session {session_id}")
+            log.info("Attempted to connect to previously closed session %s", session_id)
             # Get environ for user info checking
             environ = getattr(sio_instance, "environ", {}) if sio_instance else {}
             current_user_info = get_user_info_from_environ(environ)
@@ -192,21 +237,11 @@ async def create_terminal(
         # Try to get more accurate socket information from the session
         # For Socket.IO, we need to extract the real client information
         socket_remote_addr = None
-        if hasattr(sio_instance, "manager") and hasattr(sio_instance.manager, "get_session"):
-            try:
-                session = sio_instance.manager.get_session(sid)
-                if session and "transport" in session:
-                    transport = session["transport"]
-                    if hasattr(transport, "socket") and hasattr(transport.socket, "getpeername"):
-                        try:
-                            peer = transport.socket.getpeername()
-                            socket_remote_addr = peer[0]
-                            # Update environ with real remote port
-                            environ["REMOTE_PORT"] = str(peer[1])
-                        except:
-                            pass
-            except:
-                pass
+        peer = _get_peer_address(sid)
+        if peer:
+            socket_remote_addr = peer[0]
+            # Update environ with real remote port
+            environ["REMOTE_PORT"] = str(peer[1])
 
         # Get current user info for ownership checking
         current_user_info = get_user_info_from_environ(environ)
@@ -218,9 +253,9 @@ async def create_terminal(
         if user_name:
             try:
                 terminal_user = User(name=user_name)
-                log.debug(f"Using user: {terminal_user}")
+                log.debug("Using user: %s", terminal_user)
             except LookupError:
-                log.warning(f"Invalid user: {user_name}, falling back to default user.")
+                log.warning("Invalid user: %s, falling back to default user.", user_name)
                 terminal_user = User()  # Fallback to current user
 
         # Create terminal instance directly (not using factory since it has issues)
@@ -232,27 +267,28 @@ async def create_terminal(
             socket=socket,
             uri=f"http://{socket.local_addr}:{socket.local_port}{config_uri_root_path.rstrip('/') if config_uri_root_path else ''}/?session={session_id}",  # Full sharing URL with root path
             render_string=None,  # Not used in asyncio_terminal directly for MOTD rendering
-            broadcast=lambda s, m: broadcast_to_session(s, m),
+            broadcast=broadcast_to_session,
             login=config_login,
             pam_profile=config_pam_profile,
         )
 
         # Associate terminal with client using the new client set
-        terminal_instance.client_sids.add(sid)
+        terminal_instance.attach_client(sid)
+        await sio_instance.enter_room(sid, AsyncioTerminal.room_name(session_id))
 
         # Start the PTY
         log.debug("Starting PTY")
         await terminal_instance.start_pty()
-        log.info(f"PTY started successfully for session {session_id}")
+        log.info("PTY started successfully for session %s", session_id)
 
         # Notify client that terminal is ready
         await sio_instance.emit(
             "terminal_ready", {"session": session_id, "status": "ready"}, room=sid
         )
-        log.debug(f"Sent terminal_ready event to client {sid}")
+        log.debug("Sent terminal_ready event to client %s", sid)
 
     except Exception as e:
-        log.error(f"Error creating terminal: {e}", exc_info=True)
+        log.error("Error creating terminal: %s", e, exc_info=True)
         await sio_instance.emit("terminal_error", {"error": str(e)}, room=sid)
 
 
@@ -262,14 +298,14 @@ async def terminal_input(sid, data):
         session_id = data.get("session")
         input_data = data.get("data", "")
 
-        if session_id in AsyncioTerminal.sessions:
-            terminal = AsyncioTerminal.sessions[session_id]
+        terminal = AsyncioTerminal.sessions.get(session_id)
+        if terminal is not None:
             await terminal.write(input_data)
         else:
-            log.warning(f"Terminal session {session_id} not found")
+            log.warning("Terminal session %s not found", session_id)
 
     except Exception as e:
-        log.error(f"Error handling terminal input: {e}")
+        log.error("Error handling terminal input: %s", e)
 
 
 async def terminal_resize(sid, data):
@@ -279,77 +315,193 @@ async def terminal_resize(sid, data):
         cols = data.get("cols", 80)
         rows = data.get("rows", 24)
 
-        if session_id in AsyncioTerminal.sessions:
-            terminal = AsyncioTerminal.sessions[session_id]
+        terminal = AsyncioTerminal.sessions.get(session_id)
+        if terminal is not None:
             await terminal.resize(cols, rows)
         else:
-            log.warning(f"Terminal session {session_id} not found")
+            log.warning("Terminal session %s not found", session_id)
 
     except Exception as e:
-        log.error(f"Error handling terminal resize: {e}")
+        log.error("Error handling terminal resize: %s", e)
 
 
 def broadcast_to_session(session_id, message):
     """Broadcast message to all clients connected to a session."""
     if sio_instance:
-        import asyncio
-
-        # Get the terminal to find connected clients
-        terminal = AsyncioTerminal.sessions.get(session_id)
-        if terminal and hasattr(terminal, "client_sids"):
-            client_sids = list(terminal.client_sids)
+        if message is not None:
+            # Terminal output - coalesced, analyzed and broadcast to all clients in this session
+            _enqueue_output(session_id, message)
         else:
-            client_sids = []
+            # Deliver output still waiting in the buffer before the close notice
+            _flush_output(session_id)
+
+            # Terminal closed - notify all clients in this session, then drop the room
+            log.info("Broadcasting terminal closed for session %s", session_id)
+            room = AsyncioTerminal.room_name(session_id)
+            _queue_broadcast("terminal_closed", {"session": session_id}, room)
+            _queue_send(sio_instance.close_room, room)
+    else:
+        log.warning("sio_instance is None, cannot broadcast message")
 
-        if message is not None:
-            # リアルタイムログ解析を実行
-            log_analyzer = get_log_analyzer()
-            auto_blocker = get_auto_blocker()
-
-            detection_result = log_analyzer.analyze_output(session_id, message)
-
-            if detection_result and detection_result.should_block:
-                # 危険検出時の自動ブロック
-                block_reason = (
-                    BlockReason.CRITICAL_KEYWORD
-                    if detection_result.severity == SeverityLevel.CRITICAL
-                    else BlockReason.MULTIPLE_WARNINGS
-                )
 
-                success = auto_blocker.block_session(
-                    session_id=session_id,
-                    reason=block_reason,
-                    message=detection_result.message,
-                    alert_message=detection_result.alert_message,
-                    detected_keywords=detection_result.detected_keywords,
-                )
+@dataclass
+class _PendingOutput:
+    """Terminal output waiting to be flushed to a session's clients."""
 
-                if success:
-                    log.warning(
-                        f"Session {session_id} automatically blocked due to: {detection_result.message}"
-                    )
+    chunks: List[str] = field(default_factory=list)
+    size: int = 0
+    timer: Optional[asyncio.TimerHandle] = None
 
-            # Terminal output - broadcast to all clients in this session
-            log.debug(
-                f"Broadcasting terminal output for session {session_id} to {len(client_sids)} clients: {repr(message)}"
-            )
-            for client_sid in client_sids:
-                asyncio.create_task(
-                    sio_instance.emit(
-                        "terminal_output", {"session": session_id, "data": message}, room=client_sid
-                    )
-                )
-        else:
-            # Terminal closed - notify all clients in this session
-            log.info(
-                f"Broadcasting terminal closed for session {session_id} to {len(client_sids)} clients"
+
+def _enqueue_output(session_id, message):
+    """Buffer terminal output and schedule a flush for its session.
+
+    Output is analyzed and emitted once TERMINAL_OUTPUT_FLUSH_DELAY seconds
+    after the first buffered chunk, or immediately once
+    TERMINAL_OUTPUT_FLUSH_SIZE characters are pending, so bursts of small PTY
+    reads become one analysis pass and one emit.
+    """
+    pending = _pending_output.get(session_id)
+    if pending is None:
+        pending = _pending_output[session_id] = _PendingOutput()
+        pending.timer = asyncio.get_running_loop().call_later(
+            TERMINAL_OUTPUT_FLUSH_DELAY, _flush_output, session_id
+        )
+
+    pending.chunks.append(message)
+    pending.size += len(message)
+    if pending.size >= TERMINAL_OUTPUT_FLUSH_SIZE:
+        _flush_output(session_id)
+
+
+def _flush_output(session_id):
+    """Emit a session's buffered terminal output to all of its clients."""
+    pending = _pending_output.pop(session_id, None)
+    if pending is None:
+        return
+    pending.timer.cancel()
+
+    data = "".join(pending.chunks)
+    _queue_analysis(session_id, data)
+
+    log.debug("Broadcasting terminal output for session %s: %r", session_id, data)
+    _queue_broadcast(
+        "terminal_output",
+        {"session": session_id, "data": data},
+        AsyncioTerminal.room_name(session_id),
+    )
+
+
+def _queue_analysis(session_id, data):
+    """Hand flushed output to the analyzer task so broadcasts do not wait on it."""
+    global _analysis_queue, _analyzer_task
+    if _analyzer_task is None or _analyzer_task.done():
+        _analysis_queue = asyncio.Queue(maxsize=ANALYSIS_QUEUE_SIZE)
+        _analyzer_task = asyncio.create_task(_analysis_loop(_analysis_queue))
+    try:
+        _analysis_queue.put_nowait((session_id, data))
+    except asyncio.QueueFull:
+        log.warning("Analysis queue full, skipping output of session %s", session_id)
+
+
+async def _analysis_loop(queue):
+    """Analyze queued terminal output until cancelled."""
+    while True:
+        session_id, data = await queue.get()
+        try:
+            _analyze_output(session_id, data)
+        except Exception:
+            log.exception("Error analyzing output of session %s", session_id)
+
+
+def _analyze_output(session_id, data):
+    """Run keyword detection on flushed output and auto-block the session if needed."""
+    # リアルタイムログ解析を実行（フラッシュ単位でまとめて1回）
+    detection_result = log_analyzer_instance.analyze_output(session_id, data)
+
+    if detection_result and detection_result.should_block:
+        # 危険検出時の自動ブロック
+        block_reason = (
+            BlockReason.CRITICAL_KEYWORD
+            if detection_result.severity == SeverityLevel.CRITICAL
+            else BlockReason.MULTIPLE_WARNINGS
+        )
+
+        success = auto_blocker_instance.block_session(
+            session_id=session_id,
+            reason=block_reason,
+            message=detection_result.message,
+            alert_message=detection_result.alert_message,
+            detected_keywords=detection_result.detected_keywords,
+        )
+
+        if success:
+            log.warning(
+                "Session %s automatically blocked due to: %s",
+                session_id,
+                detection_result.message,
             )
-            for client_sid in client_sids:
-                asyncio.create_task(
-                    sio_instance.emit("terminal_closed", {"session": session_id}, room=client_sid)
-                )
-    else:
-        log.warning("sio_instance is None, cannot broadcast message")
+
+
+def _queue_broadcast(event, data, room):
+    """Queue an emit to ``room`` on the broadcaster task; ``None`` sends to everyone."""
+    _queue_send(sio_instance.emit, event, data, room=room)
+
+
+def _queue_send(send, *args, **kwargs):
+    """Run ``await send(*args, **kwargs)`` on the broadcaster task.
+
+    A single long-lived task performs all terminal broadcasts and room changes
+    in order, instead of a new task being created for every flush.
+    """
+    global _broadcast_queue, _broadcaster_task
+    if _broadcaster_task is None or _broadcaster_task.done():
+        _broadcast_queue = asyncio.Queue()
+        _broadcaster_task = asyncio.create_task(_broadcast_loop(_broadcast_queue))
+    _broadcast_queue.put_nowait((send, args, kwargs))
+
+
+async def _broadcast_loop(queue):
+    """Run queued terminal broadcasts until cancelled."""
+    while True:
+        send, args, kwargs = await queue.get()
+        try:
+            await send(*args, **kwargs)
+        except Exception:
+            log.exception("Error running queued broadcast %s", getattr(send, "__name__", send))
+
+
+def _sent_history(terminal):
+    """Return the scrollback already handed to the broadcaster for a session.
+
+    Output still buffered in _pending_output is left out; it is queued for the
+    session room when flushed.
+    """
+    history = terminal.history
+    pending = _pending_output.get(terminal.session)
+    if pending is not None:
+        history = history[: max(len(history) - pending.size, 0)]
+    return history
+
+
+async def _join_session_room(sid, session_id, history):
+    """Add a client to a running session's room and replay its scrollback.
+
+    ``history`` must be taken with _sent_history() when the join is queued.
+    Output queued for the room before the join is then sent without the new
+    client, and everything flushed afterwards reaches it through the room,
+    so each byte is delivered once.
+    """
+    await sio_instance.enter_room(sid, AsyncioTerminal.room_name(session_id))
+
+    if history:
+        await sio_instance.emit(
+            "terminal_output", {"session": session_id, "data": history}, room=sid
+        )
+    # Notify client that terminal is ready
+    await sio_instance.emit(
+        "terminal_ready", {"session": session_id, "status": "ready"}, room=sid
+    )
 
 
 async def wrapper_session_sync(sid, data):
@@ -365,8 +517,9 @@ async def wrapper_session_sync(sid, data):
             sessions = data.get("sessions", [])
             log.info(f"Bulk sync: {len(sessions)} sessions from wrapper")
 
-            # フロントエンドに同期情報を送信
-            await sio_instance.emit(
+            # 保留中の単一更新を先に送り、順序を保ったままフロントエンドに同期情報を送信
+            _flush_wrapper_updates(sid)
+            _queue_broadcast(
                 "wrapper_sessions_update",
                 {
                     "action": "bulk_sync",
@@ -374,6 +527,7 @@ async def wrapper_session_sync(sid, data):
                     "wrapper_info": wrapper_info,
                     "timestamp": data.get("timestamp"),
                 },
+                None,
             )
 
         elif action in ["created", "updated", "closed"]:
@@ -383,15 +537,11 @@ async def wrapper_session_sync(sid, data):
 
             log.debug(f"Session {action}: {session_id}")
 
-            # フロントエンドに同期情報を送信
-            await sio_instance.emit(
-                "wrapper_session_update",
-                {
-                    "action": action,
-                    "session": session,
-                    "wrapper_info": wrapper_info,
-                    "timestamp": data.get("timestamp"),
-                },
+            # フロントエンドへの同期情報はラッパー単位でまとめて送信
+            _enqueue_wrapper_update(
+                sid,
+                wrapper_info,
+                {"action": action, "session": session, "timestamp": data.get("timestamp")},
             )
 
         # 同期完了の応答を送信
@@ -408,6 +558,60 @@ async def wrapper_session_sync(sid, data):
         )
 
 
+@dataclass
+class _PendingWrapperUpdates:
+    """Single-session updates from one wrapper program waiting to be sent."""
+
+    wrapper_info: dict
+    updates: List[dict] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+def _enqueue_wrapper_update(sid, wrapper_info, update):
+    """Buffer a wrapper's session update and schedule a flush for its connection.
+
+    Updates are keyed on the sender's sid rather than the reported PID, which
+    wrappers may omit, so one wrapper's sessions are never attributed to another.
+    """
+    pending = _pending_wrapper_updates.get(sid)
+    if pending is None:
+        pending = _pending_wrapper_updates[sid] = _PendingWrapperUpdates(wrapper_info)
+        pending.timer = asyncio.get_running_loop().call_later(
+            WRAPPER_UPDATE_FLUSH_DELAY, _flush_wrapper_updates, sid
+        )
+    pending.wrapper_info = wrapper_info
+    pending.updates.append(update)
+
+
+def _flush_wrapper_updates(sid):
+    """Send a wrapper's buffered session updates to the frontend.
+
+    A lone update keeps the ``wrapper_session_update`` shape; several are sent
+    as one ``wrapper_sessions_update`` frame with action ``batch``.
+    """
+    pending = _pending_wrapper_updates.pop(sid, None)
+    if pending is None:
+        return
+    pending.timer.cancel()
+
+    if len(pending.updates) == 1:
+        update = pending.updates[0]
+        _queue_broadcast(
+            "wrapper_session_update", {**update, "wrapper_info": pending.wrapper_info}, None
+        )
+    else:
+        _queue_broadcast(
+            "wrapper_sessions_update",
+            {
+                "action": "batch",
+                "updates": pending.updates,
+                "wrapper_info": pending.wrapper_info,
+                "timestamp": pending.updates[-1]["timestamp"],
+            },
+            None,
+        )
+
+
 async def get_wrapper_sessions(sid, data):
     """Handle request for wrapper session information."""
     try:
@@ -511,27 +715,108 @@ async def get_block_status(sid, data):
 
 def get_terminal_context(session_id):
     """Extract terminal context for AI assistance."""
-    if session_id and session_id in AsyncioTerminal.sessions:
-        terminal = AsyncioTerminal.sessions[session_id]
-        context_parts = []
-
-        # Add terminal history if available
-        if hasattr(terminal, 'history') and terminal.history:
-            # Get last 1000 characters of terminal history to avoid overwhelming the AI
-            recent_history = terminal.history[-1000:] if len(terminal.history) > 1000 else terminal.history
-            context_parts.append(f"Recent terminal output:\n{recent_history}")
-
-        # Add current working directory if available
-        if hasattr(terminal, 'path') and terminal.path:
-            context_parts.append(f"Current directory: {terminal.path}")
-
-        # Add user information if available
-        if hasattr(terminal, 'user') and terminal.user:
-            context_parts.append(f"User: {terminal.user.name}")
+    terminal = AsyncioTerminal.sessions.get(session_id) if session_id else None
+    if terminal is None:
+        return None
+
+    context_parts = []
+
+    # Add the tail of the terminal history to avoid overwhelming the AI
+    recent_history = terminal.history_tail(AI_CONTEXT_HISTORY_SIZE)
+    if recent_history:
+        context_parts.append(f"Recent terminal output:\n{recent_history}")
+
+    # Add current working directory if available
+    if terminal.path:
+        context_parts.append(f"Current directory: {terminal.path}")
+
+    # Add user information if available
+    if terminal.user:
+        context_parts.append(f"User: {terminal.user.name}")
+
+    return "\n\n".join(context_parts) if context_parts else None
+
+
+async def _stream_ai_chunks(sid, event, envelope, response_generator):
+    """Relay a streamed AI response to a client, coalescing small chunks.
+
+    Tokens are buffered and handed to a sender task as one ``chunk`` string
+    once AI_CHUNK_FLUSH_SIZE characters have accumulated or
+    AI_CHUNK_FLUSH_INTERVAL seconds have passed since the last flush. A timer
+    enforces the interval, so text already received is sent even while the
+    model pauses between tokens. The sender queue is bounded; while a slow
+    client keeps it full, tokens keep coalescing instead of piling up as
+    pending emits. Returns the full response text.
+    """
+    loop = asyncio.get_running_loop()
+    send_queue = asyncio.Queue(maxsize=AI_SEND_QUEUE_SIZE)
+
+    async def sender():
+        while True:
+            chunk = await send_queue.get()
+            if chunk is None:
+                return
+            try:
+                await sio_instance.emit(event, {**envelope, 'chunk': chunk}, room=sid)
+            except Exception as e:
+                log.warning("Failed to emit %s to %s: %s", event, sid, e)
+
+    sender_task = asyncio.create_task(sender())
+    response_chunks = []
+    pending = []
+    pending_size = 0
+    last_flush = 0.0  # Flush the first token immediately
+    flush_timer = None
+
+    def flush():
+        """Hand pending text to the sender; False if its queue is full."""
+        nonlocal pending_size, last_flush, flush_timer
+        try:
+            send_queue.put_nowait("".join(pending))
+        except asyncio.QueueFull:
+            # Client is not keeping up; keep coalescing
+            return False
+        pending.clear()
+        pending_size = 0
+        last_flush = loop.time()
+        if flush_timer is not None:
+            flush_timer.cancel()
+            flush_timer = None
+        return True
 
-        return "\n\n".join(context_parts) if context_parts else None
+    def on_flush_timer():
+        nonlocal flush_timer
+        flush_timer = None
+        if pending and not flush():
+            flush_timer = loop.call_later(AI_CHUNK_FLUSH_INTERVAL, on_flush_timer)
 
-    return None
+    try:
+        async for chunk in response_generator:
+            response_chunks.append(chunk)
+            pending.append(chunk)
+            pending_size += len(chunk)
+
+            elapsed = loop.time() - last_flush
+            if pending_size >= AI_CHUNK_FLUSH_SIZE or elapsed >= AI_CHUNK_FLUSH_INTERVAL:
+                if flush():
+                    continue
+            if flush_timer is None:
+                delay = max(AI_CHUNK_FLUSH_INTERVAL - elapsed, 0)
+                flush_timer = loop.call_later(delay, on_flush_timer)
+
+        if flush_timer is not None:
+            flush_timer.cancel()
+            flush_timer = None
+        if pending:
+            await send_queue.put("".join(pending))
+        await send_queue.put(None)
+        await sender_task
+    finally:
+        if flush_timer is not None:
+            flush_timer.cancel()
+        sender_task.cancel()
+
+    return "".join(response_chunks)
 
 
 async def ai_chat_message(sid, data):
@@ -545,7 +830,7 @@ async def ai_chat_message(sid, data):
             log.warning("Empty message received for AI chat")
             return
 
-        log.info(f"Processing AI chat message from {sid}: {message[:100]}...")
+        log.debug("Processing AI chat message from %s: %.100s...", sid, message)
 
         # Get AI service
         ai_service = get_ai_service()
@@ -567,36 +852,34 @@ async def ai_chat_message(sid, data):
 
         # Stream AI response
         try:
-            response_chunks = []
-            async for chunk in ai_service.chat_completion(
-                messages=messages,
-                terminal_context=terminal_context,
-                stream=True
-            ):
-                response_chunks.append(chunk)
-                await sio_instance.emit('ai_chat_chunk', {
-                    'message_id': message_id,
-                    'chunk': chunk
-                }, room=sid)
+            full_response = await _stream_ai_chunks(
+                sid,
+                'ai_chat_chunk',
+                {'message_id': message_id},
+                ai_service.chat_completion(
+                    messages=messages,
+                    terminal_context=terminal_context,
+                    stream=True
+                ),
+            )
 
             # Send completion signal
-            full_response = ''.join(response_chunks)
             await sio_instance.emit('ai_chat_complete', {
                 'message_id': message_id,
                 'full_response': full_response
             }, room=sid)
 
-            log.info(f"AI chat completed for message_id: {message_id}")
+            log.info("AI chat completed for message_id: %s", message_id)
 
         except Exception as e:
-            log.error(f"Error during AI streaming: {e}")
+            log.error("Error during AI streaming: %s", e)
             await sio_instance.emit('ai_chat_error', {
                 'message_id': message_id,
                 'error': str(e)
             }, room=sid)
 
     except Exception as e:
-        log.error(f"Error handling AI chat message: {e}")
+        log.error("Error handling AI chat message: %s", e)
         await sio_instance.emit('ai_chat_error', {
             'message_id': data.get('message_id', ''),
             'error': 'Internal server error'
@@ -614,7 +897,7 @@ async def ai_terminal_analysis(sid, data):
             log.warning("Empty command received for AI analysis")
             return
 
-        log.info(f"Analyzing command for {sid}: {command}")
+        log.debug("Analyzing command for %s: %s", sid, command)
 
         # Get AI service
         ai_service = get_ai_service()
@@ -646,37 +929,35 @@ Keep the response concise and practical."""
 
         # Stream AI analysis
         try:
-            response_chunks = []
-            async for chunk in ai_service.chat_completion(
-                messages=messages,
-                terminal_context=terminal_context,
-                stream=True
-            ):
-                response_chunks.append(chunk)
-                await sio_instance.emit('ai_analysis_chunk', {
-                    'analysis_id': analysis_id,
-                    'chunk': chunk
-                }, room=sid)
+            full_analysis = await _stream_ai_chunks(
+                sid,
+                'ai_analysis_chunk',
+                {'analysis_id': analysis_id},
+                ai_service.chat_completion(
+                    messages=messages,
+                    terminal_context=terminal_context,
+                    stream=True
+                ),
+            )
 
             # Send completion signal
-            full_analysis = ''.join(response_chunks)
             await sio_instance.emit('ai_analysis_complete', {
                 'analysis_id': analysis_id,
                 'command': command,
                 'analysis': full_analysis
             }, room=sid)
 
-            log.info(f"AI command analysis completed for analysis_id: {analysis_id}")
+            log.info("AI command analysis completed for analysis_id: %s", analysis_id)
 
         except Exception as e:
-            log.error(f"Error during AI analysis: {e}")
+            log.error("Error during AI analysis: %s", e)
             await sio_instance.emit('ai_analysis_error', {
                 'analysis_id': analysis_id,
                 'error': str(e)
             }, room=sid)
 
     except Exception as e:
-        log.error(f"Error handling AI terminal analysis: {e}")
+        log.error("Error handling AI terminal analysis: %s", e)
         await sio_instance.emit('ai_analysis_error', {
             'analysis_id': data.get('analysis_id', ''),
             'error': 'Internal server error'
@@ -689,13 +970,8 @@ async def ai_get_info(sid, data):
         ai_service = get_ai_service()
 
         # Get AI service information
-        provider = "unknown"
-        model = "unknown"
-
-        if hasattr(ai_service, 'model'):
-            model = ai_service.model
-        if hasattr(ai_service, '__class__'):
-            provider = ai_service.__class__.__name__.lower().replace('service', '')
+        model = getattr(ai_service, 'model', "unknown")
+        provider = type(ai_service).__name__.lower().replace('service', '')
 
         is_available = await ai_service.is_available()
 
@@ -706,10 +982,13 @@ async def ai_get_info(sid, data):
             'status': 'connected' if is_available else 'disconnected'
         }, room=sid)
 
-        log.info(f"AI info requested from {sid}: provider={provider}, model={model}, available={is_available}")
+        log.debug(
+            "AI info requested from %s: provider=%s, model=%s, available=%s",
+            sid, provider, model, is_available,
+        )
 
     except Exception as e:
-        log.error(f"Error getting AI info: {e}")
+        log.error("Error getting AI info: %s", e)
         await sio_instance.emit('ai_info_response', {
             'provider': 'error',
             'model': 'error',
@@ -0,0 +1,34 @@
+"""JSON codec for the Socket.IO server.
+
+python-socketio serializes every emitted payload through the ``json`` module
+it is given. This module exposes the same ``dumps``/``loads`` interface and
+uses orjson when it is installed, falling back to the standard library.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj, **kwargs):
+    """Serialize ``obj`` to a JSON string.
+
+    python-socketio concatenates the result into the packet, so this always
+    returns ``str``. Payloads orjson cannot encode go through ``json`` instead.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass
+    return json.dumps(obj, **kwargs)
+
+
+def loads(s, **kwargs):
+    """Deserialize a JSON document received from a client."""
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s, **kwargs)
@@ -19,12 +19,16 @@ import fcntl
 import os
 import pty
 import random
-import signal
 import string
 import struct
+import subprocess
 import sys  # Import sys
 import termios
+import time
+import traceback
+from collections import OrderedDict, deque
 from logging import getLogger
+from typing import ClassVar, Dict, Set
 
 from aetherterm import utils
 
@@ -32,18 +36,30 @@ from .base_terminal import BaseTerminal
 
 log = getLogger("aetherterm.terminal")
 
+# Bytes pulled from the PTY per read; large enough to take a whole burst of
+# output (8 x 4 KiB pages) in one syscall and one executor round trip
+PTY_READ_SIZE = 8 * 4096
+
+# Number of closed session IDs remembered to refuse reconnects
+MAX_CLOSED_SESSIONS = 4096
+
 
 class AsyncioTerminal(BaseTerminal):
     sessions = {}
-    closed_sessions = set()  # Track closed session IDs
+    closed_sessions = OrderedDict()  # Recently closed session IDs, oldest first
     session_owners = {}  # Track session owners: {session_id: user_info}
+    # Reverse index of client_sids: {sid: set(session_id)}
+    sid_to_sessions: ClassVar[Dict[str, Set[str]]] = {}
 
     def __init__(
         self, user, path, session, socket, uri, render_string, broadcast, login, pam_profile
     ):
         self.sessions[session] = self
         self.history_size = 50000
-        self.history = ""
+        # Scrollback kept as a queue of output chunks plus their total length,
+        # so appending and trimming only touch the chunks involved
+        self._history_chunks = deque()
+        self._history_length = 0
         self.uri = uri
         self.session = session
         self.broadcast = broadcast
@@ -59,7 +75,7 @@ class AsyncioTerminal(BaseTerminal):
             "remote_addr": socket.remote_addr if socket else None,
             "remote_user": socket.env.get("HTTP_X_REMOTE_USER") if socket and socket.env else None,
             "user_name": user.name if user else None,
-            "created_at": __import__("time").time(),
+            "created_at": time.time(),
         }
         self.session_owners[session] = owner_info
 
@@ -92,12 +108,64 @@ class AsyncioTerminal(BaseTerminal):
 
         log.info("Forking pty for user %r" % self.user)
 
+    @staticmethod
+    def room_name(session_id):
+        """Socket.IO room joined by every client attached to a terminal session."""
+        return f"term:{session_id}"
+
+    def attach_client(self, sid):
+        """Register a Socket.IO client as a viewer of this session."""
+        self.client_sids.add(sid)
+        self.sid_to_sessions.setdefault(sid, set()).add(self.session)
+
+    def detach_client(self, sid):
+        """Unregister a Socket.IO client from this session."""
+        self.client_sids.discard(sid)
+        sessions = self.sid_to_sessions.get(sid)
+        if sessions is not None:
+            sessions.discard(self.session)
+            if not sessions:
+                del self.sid_to_sessions[sid]
+
+    @property
+    def history(self):
+        """Terminal scrollback as text (at most ``history_size`` characters)."""
+        return "".join(self._history_chunks)
+
+    def history_tail(self, size):
+        """Return the last ``size`` characters of scrollback.
+
+        Only the trailing chunks are joined, so callers needing a short
+        excerpt do not pay for materializing the whole history.
+        """
+        parts = []
+        remaining = size
+        for chunk in reversed(self._history_chunks):
+            if remaining <= 0:
+                break
+            if len(chunk) >= remaining:
+                parts.append(chunk[-remaining:])
+                break
+            parts.append(chunk)
+            remaining -= len(chunk)
+        return "".join(reversed(parts))
+
     def send(self, message):
         """Send message to all connected clients."""
-        if message is not None:
-            self.history += message
-            if len(self.history) > self.history_size:
-                self.history = self.history[-self.history_size :]
+        if message:
+            chunks = self._history_chunks
+            chunks.append(message)
+            self._history_length += len(message)
+            # Drop whole chunks from the front, trimming the last one partially
+            while self._history_length > self.history_size:
+                excess = self._history_length - self.history_size
+                oldest = chunks[0]
+                if len(oldest) <= excess:
+                    chunks.popleft()
+                    self._history_length -= len(oldest)
+                else:
+                    chunks[0] = oldest[excess:]
+                    self._history_length -= excess
         self.broadcast(self.session, message)
 
     async def start_pty(self):
@@ -118,45 +186,39 @@ class AsyncioTerminal(BaseTerminal):
         # Determine shell command
         shell_cmd = await self._get_shell_command()
 
-        try:
-            # Fork process manually since asyncio.create_subprocess_exec doesn't work well with PTY
-            pid = os.fork()
-
-            if pid == 0:
-                # Child process
-                os.close(master_fd)  # Close master in child
-
-                # Make slave the controlling terminal
-                os.setsid()
-                os.dup2(slave_fd, 0)  # stdin
-                os.dup2(slave_fd, 1)  # stdout
-                os.dup2(slave_fd, 2)  # stderr
-                os.close(slave_fd)
+        # Change to target directory if it exists, otherwise keep the server's cwd
+        cwd = self.path or self.callee.dir
+        if not cwd or not os.path.isdir(cwd):
+            cwd = None
 
-                # Change to target directory
-                try:
-                    os.chdir(self.path or self.callee.dir)
-                except Exception:
-                    pass
+        try:
+            # Spawn the shell on the PTY slave. Without a preexec_fn, Popen uses
+            # vfork()/exec on Linux instead of duplicating the server's address space
+            self.process = subprocess.Popen(
+                shell_cmd,
+                stdin=slave_fd,
+                stdout=slave_fd,
+                stderr=slave_fd,
+                cwd=cwd,
+                env=env,
+                start_new_session=True,  # setsid() in the child
+                close_fds=True,  # Close master (and every other fd) in child
+            )
+            self.pid = self.process.pid
 
-                # Set up environment and execute shell
-                os.execvpe(shell_cmd[0], shell_cmd, env)
-            else:
-                # Parent process
-                self.pid = pid
-                os.close(slave_fd)  # Close slave in parent
+            os.close(slave_fd)  # Close slave in parent
 
-                # Set master fd to non-blocking
-                fcntl.fcntl(master_fd, fcntl.F_SETFL, os.O_NONBLOCK)
+            # Set master fd to non-blocking
+            fcntl.fcntl(master_fd, fcntl.F_SETFL, os.O_NONBLOCK)
 
-                # Start reading from PTY
-                self.reader_task = asyncio.create_task(self._read_from_pty())
+            # Start reading from PTY
+            self.reader_task = asyncio.create_task(self._read_from_pty())
 
-                # Send MOTD for new sessions after a delay to allow shell initialization
-                if len(self.client_sids) == 1:  # This is the first client for this session
-                    asyncio.create_task(self._delayed_motd_send())
+            # Send MOTD for new sessions after a delay to allow shell initialization
+            if len(self.client_sids) == 1:  # This is the first client for this session
+                asyncio.create_task(self._delayed_motd_send())
 
-                log.info(f"PTY started with PID {pid}")
+            log.info(f"PTY started with PID {self.pid}")
 
         except Exception as e:
             log.error(f"Failed to start PTY: {e}")
@@ -241,47 +303,50 @@ class AsyncioTerminal(BaseTerminal):
         try:
             while not self.closed:
                 try:
-                    # Check if child process is still alive
-                    if hasattr(self, "pid"):
-                        try:
-                            pid, status = os.waitpid(self.pid, os.WNOHANG)
-                            if pid != 0:  # Process has exited
-                                log.info(f"Child process {self.pid} exited with status {status}")
-                                break
-                        except OSError:
-                            # Process doesn't exist anymore
-                            break
-
                     # Read from PTY with timeout
                     data = await asyncio.wait_for(
                         asyncio.get_event_loop().run_in_executor(None, self._read_pty_data),
                         timeout=0.1,
                     )
-
-                    if data:
-                        # Decode and send to clients
-                        try:
-                            text = data.decode("utf-8", "replace")
-                            self.send(text)
-                        except Exception as e:
-                            log.error(f"Error decoding PTY data: {e}")
-
                 except asyncio.TimeoutError:
-                    # No data available, continue
-                    continue
+                    # No data available
+                    data = b""
                 except Exception as e:
                     log.error(f"Error reading from PTY: {e}")
                     break
 
+                if data:
+                    # Decode and send to clients
+                    try:
+                        text = data.decode("utf-8", "replace")
+                        self.send(text)
+                    except Exception as e:
+                        log.error(f"Error decoding PTY data: {e}")
+                    continue
+
+                # Only poll the child when the PTY is idle, not for every chunk of output
+                if self._child_exited():
+                    break
+
         except Exception as e:
             log.error(f"PTY reader task error: {e}")
         finally:
             await self.close()
 
+    def _child_exited(self):
+        """Return True once the shell process has exited (reaping it if so)."""
+        if self.process is None:
+            return False
+        returncode = self.process.poll()
+        if returncode is None:
+            return False
+        log.info(f"Child process {self.process.pid} exited with status {returncode}")
+        return True
+
     def _read_pty_data(self):
         """Read data from PTY (blocking operation for executor)."""
         try:
-            return os.read(self.fd, 4096)
+            return os.read(self.fd, PTY_READ_SIZE)
         except OSError:
             return b""
 
@@ -335,29 +400,21 @@ class AsyncioTerminal(BaseTerminal):
             except Exception as e:
                 log.debug(f"Error closing PTY fd: {e}")
 
-        # Terminate process
-        if hasattr(self, "pid"):
+        # Terminate process (reaped through Popen so its returncode is recorded)
+        if self.process is not None and self.process.poll() is None:
             try:
                 # Send SIGTERM first
-                os.kill(self.pid, signal.SIGTERM)
+                self.process.terminate()
 
                 # Wait a bit for graceful termination
                 for _ in range(50):  # Wait up to 5 seconds
-                    try:
-                        pid, status = os.waitpid(self.pid, os.WNOHANG)
-                        if pid != 0:  # Process has exited
-                            break
-                    except OSError:
-                        # Process doesn't exist anymore
+                    if self.process.poll() is not None:
                         break
                     await asyncio.sleep(0.1)
                 else:
                     # Force kill if still alive
-                    try:
-                        os.kill(self.pid, signal.SIGKILL)
-                        os.waitpid(self.pid, 0)
-                    except OSError:
-                        pass
+                    self.process.kill()
+                    self.process.wait()
 
             except Exception as e:
                 log.error(f"Error terminating process: {e}")
@@ -369,16 +426,25 @@ class AsyncioTerminal(BaseTerminal):
             except Exception as e:
                 log.debug(f"Error removing user info: {e}")
 
+        # Notify clients that terminal is closed (while the session is still
+        # registered, so the broadcast can find its clients)
+        self.send(None)
+        for sid in list(self.client_sids):
+            self.detach_client(sid)
+
         # Remove from sessions and add to closed sessions
         if self.session in self.sessions:
             del self.sessions[self.session]
 
         # Track this session as closed (keep owner info for ownership checking)
-        self.closed_sessions.add(self.session)
-        # Note: We keep session_owners[self.session] for ownership checking
-
-        # Notify clients that terminal is closed
-        self.send(None)
+        closed_sessions = self.closed_sessions
+        closed_sessions[self.session] = None
+        closed_sessions.move_to_end(self.session)
+        while len(closed_sessions) > MAX_CLOSED_SESSIONS:
+            expired, _ = closed_sessions.popitem(last=False)
+            # Owner info is only needed while the session is live or remembered
+            if expired not in self.sessions:
+                self.session_owners.pop(expired, None)
 
     async def _delayed_motd_send(self):
         """Send MOTD after shell initialization is complete."""
@@ -432,8 +498,6 @@ class AsyncioTerminal(BaseTerminal):
 
         except Exception as e:
             log.error(f"Failed to send MOTD directly: {e}")
-            import traceback
-
             log.error(traceback.format_exc())
 
     async def _send_motd(self):
@@ -489,6 +553,4 @@ class AsyncioTerminal(BaseTerminal):
 
         except Exception as e:
             log.error(f"Failed to send MOTD: {e}")
-            import traceback
-
             log.error(traceback.format_exc())
@@ -0,0 +1,75 @@
+"""
+Tests for coalescing streamed AI responses into chunk emits.
+"""
+
+import asyncio
+
+import pytest
+
+from aetherterm.agentserver import socket_handlers
+
+
+class FakeAsyncServer:
+    """Records emitted chunks with the loop time they were sent at."""
+
+    def __init__(self):
+        self.chunks = []  # (loop time, chunk)
+
+    async def emit(self, event, data=None, to=None, room=None, **kwargs):
+        self.chunks.append((asyncio.get_running_loop().time(), data["chunk"]))
+
+
+@pytest.fixture
+def sio(monkeypatch):
+    fake = FakeAsyncServer()
+    monkeypatch.setattr(socket_handlers, "sio_instance", fake)
+    return fake
+
+
+async def _tokens(tokens, pause_after=None, pause=0.0):
+    for i, token in enumerate(tokens):
+        yield token
+        if i == pause_after:
+            await asyncio.sleep(pause)
+
+
+@pytest.mark.asyncio
+async def test_stream_returns_and_emits_full_text(sio):
+    """Every token is emitted exactly once and the full response is returned."""
+    tokens = [f"t{i} " for i in range(200)]
+
+    response = await socket_handlers._stream_ai_chunks(
+        "sid", "ai_chat_chunk", {"message_id": "m"}, _tokens(tokens)
+    )
+
+    assert response == "".join(tokens)
+    assert "".join(chunk for _, chunk in sio.chunks) == response
+    assert len(sio.chunks) < len(tokens)
+
+
+@pytest.mark.asyncio
+async def test_size_cap_splits_chunks(sio, monkeypatch):
+    """Pending text is flushed once AI_CHUNK_FLUSH_SIZE characters accumulate."""
+    monkeypatch.setattr(socket_handlers, "AI_CHUNK_FLUSH_SIZE", 10)
+    monkeypatch.setattr(socket_handlers, "AI_CHUNK_FLUSH_INTERVAL", 60)
+
+    await socket_handlers._stream_ai_chunks("sid", "ev", {}, _tokens(["12345"] * 6))
+
+    assert [chunk for _, chunk in sio.chunks] == ["12345", "1234512345", "1234512345", "12345"]
+
+
+@pytest.mark.asyncio
+async def test_pause_does_not_hold_back_received_tokens(sio):
+    """Tokens received before the model pauses are sent without waiting for the next one."""
+    pause = 0.3
+    tokens = ["a", "b", "c", "d", "LAST"]
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    await socket_handlers._stream_ai_chunks(
+        "sid", "ev", {}, _tokens(tokens, pause_after=3, pause=pause)
+    )
+
+    sent_before_pause = "".join(chunk for sent_at, chunk in sio.chunks if sent_at - started < pause)
+    assert sent_before_pause == "abcd"
+    assert sio.chunks[-1][1] == "LAST"
@@ -0,0 +1,175 @@
+"""
+Tests for coalesced terminal output delivery through per-session rooms.
+"""
+
+import asyncio
+
+import pytest
+
+from aetherterm.agentserver import socket_handlers
+from aetherterm.agentserver.auto_blocker import AutoBlocker
+from aetherterm.agentserver.log_analyzer import LogAnalyzer
+from aetherterm.agentserver.terminals.asyncio_terminal import AsyncioTerminal
+
+
+class FakeAsyncServer:
+    """Records emits as the sids that would receive them at emit time."""
+
+    def __init__(self):
+        self.rooms = {}
+        self.events = []  # (event, data, recipient sids)
+
+    async def emit(self, event, data=None, to=None, room=None, **kwargs):
+        target = to or room
+        recipients = set(self.rooms.get(target, ())) or {target}
+        self.events.append((event, data, recipients))
+
+    async def enter_room(self, sid, room, namespace=None):
+        self.rooms.setdefault(room, set()).add(sid)
+
+    async def close_room(self, room, namespace=None):
+        self.rooms.pop(room, None)
+        self.events.append(("close_room", None, {room}))
+
+    def output_for(self, sid):
+        return "".join(
+            data["data"]
+            for event, data, recipients in self.events
+            if event == "terminal_output" and sid in recipients
+        )
+
+
+class FakeTerminal:
+    """Just the attributes _sent_history reads from a terminal."""
+
+    def __init__(self, session):
+        self.session = session
+        self.history = ""
+
+    def send(self, message):
+        self.history += message
+        socket_handlers.broadcast_to_session(self.session, message)
+
+
+@pytest.fixture
+def sio(monkeypatch):
+    fake = FakeAsyncServer()
+    monkeypatch.setattr(socket_handlers, "sio_instance", fake)
+    monkeypatch.setattr(socket_handlers, "log_analyzer_instance", LogAnalyzer())
+    monkeypatch.setattr(socket_handlers, "auto_blocker_instance", AutoBlocker(fake))
+    monkeypatch.setattr(socket_handlers, "_pending_output", {})
+    monkeypatch.setattr(socket_handlers, "_broadcaster_task", None)
+    monkeypatch.setattr(socket_handlers, "_analyzer_task", None)
+    return fake
+
+
+def _queue_join(sid, terminal):
+    """Queue a client join the way create_terminal does for a running session."""
+    socket_handlers._queue_send(
+        socket_handlers._join_session_room,
+        sid,
+        terminal.session,
+        socket_handlers._sent_history(terminal),
+    )
+
+
+async def _drain():
+    """Let the flush timer and the broadcaster task run."""
+    await asyncio.sleep(socket_handlers.TERMINAL_OUTPUT_FLUSH_DELAY * 5)
+
+
+@pytest.mark.asyncio
+async def test_output_is_coalesced_into_one_room_emit(sio):
+    """Small chunks within the flush delay reach the room as a single emit."""
+    room = AsyncioTerminal.room_name("s1")
+    await sio.enter_room("a", room)
+    await sio.enter_room("b", room)
+
+    for chunk in ("ab", "cd", "ef"):
+        socket_handlers.broadcast_to_session("s1", chunk)
+    await _drain()
+
+    outputs = [e for e in sio.events if e[0] == "terminal_output"]
+    assert len(outputs) == 1
+    assert outputs[0][1] == {"session": "s1", "data": "abcdef"}
+    assert outputs[0][2] == {"a", "b"}
+
+
+@pytest.mark.asyncio
+async def test_output_flushes_immediately_at_size_cap(sio, monkeypatch):
+    """Reaching TERMINAL_OUTPUT_FLUSH_SIZE flushes without waiting for the timer."""
+    monkeypatch.setattr(socket_handlers, "TERMINAL_OUTPUT_FLUSH_SIZE", 4)
+    await sio.enter_room("a", AsyncioTerminal.room_name("s1"))
+
+    socket_handlers.broadcast_to_session("s1", "abcd")
+    assert "s1" not in socket_handlers._pending_output
+    await asyncio.sleep(0)
+
+    assert sio.output_for("a") == "abcd"
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_output_before_notice(sio):
+    """Buffered output, terminal_closed and close_room are delivered in order."""
+    room = AsyncioTerminal.room_name("s1")
+    await sio.enter_room("a", room)
+
+    socket_handlers.broadcast_to_session("s1", "bye")
+    socket_handlers.broadcast_to_session("s1", None)
+    await _drain()
+
+    assert [e[0] for e in sio.events] == ["terminal_output", "terminal_closed", "close_room"]
+    assert sio.output_for("a") == "bye"
+    assert room not in sio.rooms
+
+
+@pytest.mark.asyncio
+async def test_output_only_reaches_its_session(sio):
+    """Clients of other sessions do not receive a session's output."""
+    await sio.enter_room("a", AsyncioTerminal.room_name("s1"))
+    await sio.enter_room("b", AsyncioTerminal.room_name("s2"))
+
+    socket_handlers.broadcast_to_session("s1", "one")
+    socket_handlers.broadcast_to_session("s2", "two")
+    await _drain()
+
+    assert sio.output_for("a") == "one"
+    assert sio.output_for("b") == "two"
+
+
+@pytest.mark.asyncio
+async def test_joining_client_gets_each_byte_once(sio):
+    """A client joining mid-stream sees queued and buffered output exactly once."""
+    terminal = FakeTerminal("s1")
+    await sio.enter_room("a", AsyncioTerminal.room_name("s1"))
+
+    terminal.send("AAA")
+    socket_handlers._flush_output("s1")  # queued for the room, not yet sent
+    terminal.send("BBB")  # still buffered in _pending_output
+    _queue_join("b", terminal)
+    await _drain()
+
+    assert sio.output_for("a") == "AAABBB"
+    assert sio.output_for("b") == "AAABBB"
+    ready = [e for e in sio.events if e[0] == "terminal_ready"]
+    assert len(ready) == 1
+    assert ready[0][2] == {"b"}
+
+
+@pytest.mark.asyncio
+async def test_output_flushed_after_join_is_queued_is_sent_once(sio):
+    """Output flushed between queueing the join and running it is not replayed."""
+    terminal = FakeTerminal("s1")
+    await sio.enter_room("a", AsyncioTerminal.room_name("s1"))
+
+    terminal.send("AAA")
+    socket_handlers._flush_output("s1")
+    await _drain()  # AAA already sent to the room
+    terminal.send("BBB")  # buffered when the join is queued
+    _queue_join("b", terminal)
+    socket_handlers._flush_output("s1")  # BBB queued behind the join
+    terminal.send("CCC")
+    await _drain()
+
+    assert sio.output_for("a") == "AAABBBCCC"
+    assert sio.output_for("b") == "AAABBBCCC"
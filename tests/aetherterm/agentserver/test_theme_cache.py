@@ -0,0 +1,175 @@
+"""
+Tests for compiled theme CSS caching and its ETag.
+"""
+
+import asyncio
+import os
+import re
+import sys
+import types
+
+import pytest
+
+from aetherterm.agentserver import routes
+
+
+def _fake_compile(filename, include_paths):
+    """Inline ``@import "name"`` from the include paths, like sass does for partials."""
+
+    def resolve(name):
+        for base in include_paths:
+            path = os.path.join(base, f"_{name}.scss")
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(name)
+
+    def expand(path):
+        with open(path) as f:
+            source = f.read()
+        return re.sub(r'@import "([^"]+)";', lambda m: expand(resolve(m.group(1))), source)
+
+    return expand(filename)
+
+
+class FakeRequest:
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def compiles():
+    """Style files passed to the sass compiler, in call order."""
+    return []
+
+
+@pytest.fixture
+def theme_dir(tmp_path, monkeypatch, compiles):
+    def compile(filename, include_paths):
+        compiles.append(filename)
+        return _fake_compile(filename, include_paths)
+
+    monkeypatch.setitem(sys.modules, "sass", types.SimpleNamespace(compile=compile))
+    monkeypatch.setattr(routes, "_get_themes_directory", lambda: str(tmp_path / "themes"))
+    monkeypatch.setattr(routes, "_get_theme_css_cache_directory", lambda: str(tmp_path / "cache"))
+    monkeypatch.setattr(routes, "_theme_cache", routes.OrderedDict())
+    monkeypatch.setattr(routes, "_theme_digests", {})
+    routes._resolve_theme_dir.cache_clear()
+
+    theme = tmp_path / "themes" / "mytheme"
+    theme.mkdir(parents=True)
+    (theme / "style.scss").write_text('@import "colors";\n')
+    (theme / "_colors.scss").write_text("body { color: red; }\n")
+    return theme
+
+
+def _touch_later(path, text):
+    """Rewrite a file and move its mtime forward so the change is always visible."""
+    st = os.stat(path)
+    path.write_text(text)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def no_digest_memo(monkeypatch):
+    """Recompute the source digest on every request, as if the TTL had expired."""
+    monkeypatch.setattr(routes, "THEME_DIGEST_TTL", 0)
+
+
+@pytest.mark.asyncio
+async def test_unchanged_theme_is_compiled_once(theme_dir, compiles):
+    """A second request is served from the in-memory cache."""
+    first = await routes.theme_style("mytheme", FakeRequest())
+    second = await routes.theme_style("mytheme", FakeRequest())
+
+    assert first.body == second.body == b"body { color: red; }\n\n"
+    assert len(compiles) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_compile_once(theme_dir, compiles):
+    """Requests racing on a cold cache share one compile and leave no lock behind."""
+    responses = await asyncio.gather(
+        *(routes.theme_style("mytheme", FakeRequest()) for _ in range(3))
+    )
+
+    assert {r.body for r in responses} == {b"body { color: red; }\n\n"}
+    assert len(compiles) == 1
+    assert routes._compile_locks == {}
+    assert routes._compile_waiters == {}
+
+
+@pytest.mark.asyncio
+async def test_editing_imported_partial_recompiles(theme_dir, compiles, no_digest_memo):
+    """Changing an @import-ed partial invalidates the cached CSS and its ETag."""
+    first = await routes.theme_style("mytheme", FakeRequest())
+    _touch_later(theme_dir / "_colors.scss", "body { color: blue; }\n")
+
+    second = await routes.theme_style("mytheme", FakeRequest())
+
+    assert b"blue" in second.body
+    assert second.headers["etag"] != first.headers["etag"]
+    assert len(compiles) == 2
+
+
+@pytest.mark.asyncio
+async def test_etag_revalidation(theme_dir, no_digest_memo):
+    """A matching If-None-Match is answered with 304 until a partial changes."""
+    first = await routes.theme_style("mytheme", FakeRequest())
+    etag = first.headers["etag"]
+
+    cached = await routes.theme_style("mytheme", FakeRequest({"if-none-match": etag}))
+    assert cached.status_code == 304
+
+    _touch_later(theme_dir / "_colors.scss", "body { color: blue; }\n")
+    changed = await routes.theme_style("mytheme", FakeRequest({"if-none-match": etag}))
+    assert changed.status_code == 200
+    assert b"blue" in changed.body
+
+
+@pytest.mark.asyncio
+async def test_revalidation_within_ttl_skips_source_walk(theme_dir, monkeypatch):
+    """Cache hits and 304s reuse the memoized digest instead of walking the sources."""
+    first = await routes.theme_style("mytheme", FakeRequest())
+    walks = []
+    monkeypatch.setattr(routes.os, "walk", lambda top: walks.append(top) or iter(()))
+
+    cached = await routes.theme_style(
+        "mytheme", FakeRequest({"if-none-match": first.headers["etag"]})
+    )
+    again = await routes.theme_style("mytheme", FakeRequest())
+
+    assert cached.status_code == 304
+    assert again.body == first.body
+    assert walks == []
+
+
+@pytest.mark.asyncio
+async def test_new_file_in_theme_dir_refreshes_digest(theme_dir, compiles):
+    """Adding a file changes the theme dir's mtime and invalidates the memoized digest."""
+    first = await routes.theme_style("mytheme", FakeRequest())
+    st = os.stat(theme_dir)
+    (theme_dir / "_extra.scss").write_text("")
+    os.utime(theme_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    second = await routes.theme_style("mytheme", FakeRequest())
+
+    assert second.headers["etag"] != first.headers["etag"]
+    assert len(compiles) == 2
+
+
+@pytest.mark.asyncio
+async def test_fresh_cache_serves_compiled_css_from_disk(theme_dir, compiles, monkeypatch):
+    """A new process reuses CSS cached on disk; the theme directory is left untouched."""
+    before = sorted(os.listdir(theme_dir))
+    first = await routes.theme_style("mytheme", FakeRequest())
+
+    monkeypatch.setattr(routes, "_theme_cache", routes.OrderedDict())
+    monkeypatch.setattr(routes, "_theme_digests", {})
+    second = await routes.theme_style("mytheme", FakeRequest())
+
+    assert second.body == first.body
+    assert second.headers["etag"] == first.headers["etag"]
+    assert len(compiles) == 1
+    assert sorted(os.listdir(theme_dir)) == before
+    cache_dir = routes._get_theme_css_cache_directory()
+    assert os.listdir(cache_dir) == [f"{first.headers['etag'][3:-1]}.css"]